@@ -0,0 +1,82 @@
+# bulk_pipeline.py
+
+import logging
+import os
+import threading
+
+from output_profiles import PROFILES, COPY_PROFILE
+
+class ProfilePipeline:
+    # Each URL is downloaded once as a stream copy on the I/O engine. Every other
+    # profile is then produced from that local file: remuxes stay on the I/O engine,
+    # re-encodes go to the transcode engine, whose size and per-job ffmpeg thread
+    # count are chosen together so the cores are not oversubscribed.
+    def __init__(self, io_engine, transcode_engine, profiles, stop_event, transcode_threads=None):
+        self.io_engine = io_engine
+        self.transcode_engine = transcode_engine
+        self.profiles = profiles
+        self.stop_event = stop_event
+        self.transcode_threads = transcode_threads
+
+    def threads_for(self, profile):
+        if not profile.cpu_bound or not self.transcode_threads:
+            return None
+        if profile.max_threads:
+            return min(self.transcode_threads, profile.max_threads)
+        return self.transcode_threads
+
+    def submit(self, url, base_path, completion_callback, progress_callback=None):
+        # completion_callback(profile, success) is called once per profile.
+        progress_callback = progress_callback or (lambda progress: None)
+        copy_profile = PROFILES[COPY_PROFILE]
+        keep_source = copy_profile in self.profiles
+        source_filename = copy_profile.output_filename(base_path) if keep_source else f"{base_path}.source.mp4"
+        derived_profiles = [profile for profile in self.profiles if profile is not copy_profile]
+        remaining = {'count': len(derived_profiles)}
+        lock = threading.Lock()
+
+        def remove_source():
+            if not keep_source and os.path.exists(source_filename):
+                try:
+                    os.remove(source_filename)
+                except OSError as e:
+                    logging.error(f"Error removing intermediate file {source_filename}: {e}")
+
+        def derived_complete(profile, success):
+            completion_callback(profile, success)
+            with lock:
+                remaining['count'] -= 1
+                finished = remaining['count'] == 0
+            if finished:
+                remove_source()
+
+        def source_complete(success):
+            if keep_source:
+                completion_callback(copy_profile, success)
+            if not success:
+                for profile in derived_profiles:
+                    completion_callback(profile, False)
+                remove_source()
+                return
+            for profile in derived_profiles:
+                engine = self.transcode_engine if profile.cpu_bound else self.io_engine
+                task = engine.create_task(
+                    url=source_filename,
+                    output_filename=profile.output_filename(base_path),
+                    progress_callback=progress_callback,
+                    completion_callback=lambda success, profile=profile: derived_complete(profile, success),
+                    stop_event=self.stop_event,
+                    profile=profile,
+                    threads=self.threads_for(profile)
+                )
+                engine.submit(task)
+
+        task = self.io_engine.create_task(
+            url=url,
+            output_filename=source_filename,
+            progress_callback=progress_callback,
+            completion_callback=source_complete,
+            stop_event=self.stop_event,
+            profile=copy_profile
+        )
+        self.io_engine.submit(task)
@@ -0,0 +1,165 @@
+# conversion_engine.py
+
+import asyncio
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from conversion_task import ConversionTask, AsyncConversionTask
+
+# Child watchers are deprecated in 3.12 and removed in 3.14, where asyncio
+# already reaps children with pidfds per loop.
+if sys.version_info < (3, 12):
+    class LoopLocalPidfdChildWatcher(asyncio.AbstractChildWatcher):
+        # Like asyncio.PidfdChildWatcher, but each pidfd is registered on the loop that
+        # spawned the child rather than on one fixed loop, so engine loops and
+        # asyncio.run() in other threads can all start subprocesses safely.
+        # This is what asyncio itself does from 3.12 on.
+        def __init__(self):
+            self.lock = threading.Lock()
+            self.handlers = {}
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, exc_type, exc_value, exc_traceback):
+            pass
+
+        def is_active(self):
+            return True
+
+        def attach_loop(self, loop):
+            pass
+
+        def close(self):
+            pass
+
+        def add_child_handler(self, pid, callback, *args):
+            loop = asyncio.get_running_loop()
+            pidfd = os.pidfd_open(pid)
+            with self.lock:
+                self.handlers[pid] = (loop, pidfd)
+            loop.add_reader(pidfd, self.reap, pid, callback, args)
+
+        def remove_child_handler(self, pid):
+            with self.lock:
+                handler = self.handlers.pop(pid, None)
+            if handler is None:
+                return False
+            loop, pidfd = handler
+            loop.remove_reader(pidfd)
+            os.close(pidfd)
+            return True
+
+        def reap(self, pid, callback, args):
+            if not self.remove_child_handler(pid):
+                return
+            try:
+                _, status = os.waitpid(pid, 0)
+                returncode = os.waitstatus_to_exitcode(status)
+            except ChildProcessError:
+                returncode = 255
+            callback(pid, returncode, *args)
+
+def use_pidfd_child_watcher():
+    # Before 3.12 asyncio reaps every child from its own waiter thread, which would
+    # bring back one thread per conversion. Pidfds keep reaping on the loops themselves.
+    if sys.version_info < (3, 12) and hasattr(os, 'pidfd_open'):
+        if not isinstance(asyncio.get_child_watcher(), LoopLocalPidfdChildWatcher):
+            asyncio.set_child_watcher(LoopLocalPidfdChildWatcher())
+
+class ThreadPoolEngine:
+    # One pool thread per active conversion, blocking on the ffmpeg pipe.
+    def __init__(self, max_workers=4):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def create_task(self, **kwargs):
+        return ConversionTask(**kwargs)
+
+    def submit(self, task):
+        return self.executor.submit(task.run)
+
+    def sibling(self, max_workers):
+        # Same kind of engine with its own concurrency cap.
+        return ThreadPoolEngine(max_workers=max_workers)
+
+    def shutdown(self, wait=False):
+        self.executor.shutdown(wait=wait)
+
+class AsyncioEngine:
+    # All conversions share a single event loop thread; max_workers caps how many
+    # ffmpeg children run at once.
+    def __init__(self, max_workers=4, loop=None):
+        self.semaphore = asyncio.Semaphore(max_workers)
+        self.tasks = set()
+        self.is_shut_down = False
+        self.owns_loop = loop is None
+        if self.owns_loop:
+            self.loop = asyncio.new_event_loop()
+            use_pidfd_child_watcher()
+            self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+            self.thread.start()
+        else:
+            self.loop = loop
+
+    def create_task(self, **kwargs):
+        return AsyncConversionTask(**kwargs)
+
+    def submit(self, task):
+        return asyncio.run_coroutine_threadsafe(self.run_task(task), self.loop)
+
+    def sibling(self, max_workers):
+        # Shares this engine's event loop but caps its own concurrency separately.
+        return AsyncioEngine(max_workers=max_workers, loop=self.loop)
+
+    async def run_task(self, task):
+        self.tasks.add(asyncio.current_task())
+        started = False
+        try:
+            async with self.semaphore:
+                started = True
+                await task.run_async()
+        except asyncio.CancelledError:
+            # Still queued behind the semaphore; report it like a stopped conversion.
+            if not started:
+                task.completion_callback(False)
+            raise
+        finally:
+            self.tasks.discard(asyncio.current_task())
+
+    async def cancel_tasks(self):
+        # The owning engine also cancels conversions submitted through its siblings.
+        current = asyncio.current_task()
+        tasks = [task for task in (asyncio.all_tasks() if self.owns_loop else self.tasks) if task is not current]
+        for task in tasks:
+            task.cancel()
+        # Cancellation terminates each ffmpeg child and reports completion_callback(False).
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def shutdown(self, wait=False):
+        if self.is_shut_down or (not self.owns_loop and not self.loop.is_running()):
+            return
+        self.is_shut_down = True
+        future = asyncio.run_coroutine_threadsafe(self.cancel_tasks(), self.loop)
+        if not self.owns_loop:
+            if wait:
+                future.result()
+            return
+        # Stop the loop only after cancel_tasks() has delivered its result, otherwise
+        # the future never completes.
+        future.add_done_callback(lambda _: self.loop.call_soon_threadsafe(self.loop.stop))
+        if wait:
+            future.result()
+            self.thread.join()
+
+ENGINES = {
+    'thread': ThreadPoolEngine,
+    'asyncio': AsyncioEngine,
+}
+
+def create_engine(name='thread', max_workers=4):
+    try:
+        return ENGINES[name](max_workers=max_workers)
+    except KeyError:
+        raise ValueError(f"Unknown conversion engine: {name}. Choose from {', '.join(ENGINES)}.")
@@ -1,25 +1,40 @@
+import asyncio
 import subprocess
 import re
 import logging
 
+from output_profiles import PROFILES, COPY_PROFILE
+
 class ConversionTask:
-    def __init__(self, url, output_filename, progress_callback, completion_callback, stop_event):
+    time_pattern = re.compile(r'time=(\d{2}):(\d{2}):(\d{2})\.(\d{2})')
+
+    def __init__(self, url, output_filename, progress_callback, completion_callback, stop_event, profile=None, threads=None):
         self.url = url
         self.output_filename = output_filename
         self.progress_callback = progress_callback
         self.completion_callback = completion_callback
         self.stop_event = stop_event
+        self.profile = profile or PROFILES[COPY_PROFILE]
+        self.threads = threads
         self.process = None
+        self.duration = None
+
+    def build_command(self):
+        command = ['ffmpeg']
+        if self.threads:
+            # Cap the decoder and the filtergraph too, not just the encoder.
+            command += ['-filter_threads', str(self.threads), '-threads', str(self.threads)]
+        command += ['-i', self.url, '-y', '-progress', 'pipe:1'] + self.profile.ffmpeg_args
+        if self.threads:
+            command += ['-threads', str(self.threads)]
+        return command + [self.output_filename]
 
     def run(self):
         try:
             if self.stop_event.is_set():
                 self.completion_callback(False)
                 return
-            command = ['ffmpeg', '-i', self.url, '-y', '-progress', 'pipe:1', '-vcodec', 'copy', '-acodec', 'copy', self.output_filename]
-            self.process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
-            time_pattern = re.compile(r'time=(\d{2}):(\d{2}):(\d{2})\.(\d{2})')
-            duration = None
+            self.process = subprocess.Popen(self.build_command(), stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
             while True:
                 if self.stop_event.is_set():
                     self.process.terminate()
@@ -28,14 +43,7 @@ class ConversionTask:
                 line = self.process.stdout.readline()
                 if not line:
                     break
-                if duration is None and "Duration" in line:
-                    duration = self.get_duration_from_ffmpeg(line)
-                match = time_pattern.search(line)
-                if match and duration:
-                    hours, minutes, seconds = int(match.group(1)), int(match.group(2)), int(match.group(3))
-                    current_seconds = hours * 3600 + minutes * 60 + seconds
-                    progress = current_seconds / duration * 100
-                    self.progress_callback(progress)
+                self.handle_output_line(line)
             self.process.wait()
             if self.process.returncode == 0:
                 self.completion_callback(True)
@@ -49,9 +57,66 @@ class ConversionTask:
             logging.error(f"Exception during conversion: {e}")
             self.completion_callback(False)
 
+    def handle_output_line(self, line):
+        if self.duration is None and "Duration" in line:
+            self.duration = self.get_duration_from_ffmpeg(line)
+        match = self.time_pattern.search(line)
+        if match and self.duration:
+            hours, minutes, seconds = int(match.group(1)), int(match.group(2)), int(match.group(3))
+            current_seconds = hours * 3600 + minutes * 60 + seconds
+            progress = current_seconds / self.duration * 100
+            self.progress_callback(progress)
+
     def get_duration_from_ffmpeg(self, line):
         duration_match = re.search(r'Duration: (\d{2}):(\d{2}):(\d{2})\.\d{2}', line)
         if duration_match:
             hours, minutes, seconds = map(int, duration_match.groups())
             return hours * 3600 + minutes * 60 + seconds
         return None
+
+class AsyncConversionTask(ConversionTask):
+    # Same API as ConversionTask, but the ffmpeg child is driven from an event loop
+    # so many conversions can share one thread. run() remains available for callers
+    # that are not themselves async.
+    stop_poll_interval = 0.5
+
+    def run(self):
+        asyncio.run(self.run_async())
+
+    async def run_async(self):
+        try:
+            if self.stop_event.is_set():
+                self.completion_callback(False)
+                return
+            self.process = await asyncio.create_subprocess_exec(*self.build_command(), stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT)
+            while True:
+                if self.stop_event.is_set():
+                    self.process.terminate()
+                    await self.process.wait()
+                    self.completion_callback(False)
+                    return
+                try:
+                    line = await asyncio.wait_for(self.process.stdout.readline(), self.stop_poll_interval)
+                except asyncio.TimeoutError:
+                    continue
+                if not line:
+                    break
+                self.handle_output_line(line.decode(errors='replace'))
+            await self.process.wait()
+            if self.process.returncode == 0:
+                self.completion_callback(True)
+            else:
+                error_message = (await self.process.stdout.read()).decode(errors='replace')
+                logging.error(f"Conversion failed for URL: {self.url} with error: {error_message}")
+                self.completion_callback(False)
+        except asyncio.CancelledError:
+            if self.process and self.process.returncode is None:
+                self.process.terminate()
+                await self.process.wait()
+            self.completion_callback(False)
+            raise
+        except Exception as e:
+            if self.process and self.process.returncode is None:
+                self.process.terminate()
+            logging.error(f"Exception during conversion: {e}")
+            self.completion_callback(False)
@@ -0,0 +1,429 @@
+# distributed_conversion.py
+
+import argparse
+import csv
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from conversion_task import ConversionTask
+
+LEASE_TIMEOUT = 30
+HEARTBEAT_INTERVAL = 5
+POLL_INTERVAL = 2
+MAX_ATTEMPTS = 3
+RETRY_TIMEOUT = 60
+
+
+class JobQueue:
+    def __init__(self, lease_timeout=LEASE_TIMEOUT, progress_callback=None, completion_callback=None, max_attempts=MAX_ATTEMPTS, worker_timeout=None):
+        self.lease_timeout = lease_timeout
+        # Idle workers only call in every POLL_INTERVAL, so silence shorter than that
+        # does not mean a worker is gone.
+        self.worker_timeout = worker_timeout or max(lease_timeout, 2 * POLL_INTERVAL)
+        self.progress_callback = progress_callback
+        self.completion_callback = completion_callback
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.jobs = {}
+        self.pending = deque()
+        self.leases = {}
+        # worker_id -> {'last_seen': monotonic time, 'released': told the queue is finished}
+        self.workers = {}
+
+    def add_job(self, url, output_filename):
+        job_id = uuid.uuid4().hex
+        with self.lock:
+            self.jobs[job_id] = {
+                'job_id': job_id,
+                'url': url,
+                'output_filename': output_filename,
+                'state': 'pending',
+                'progress': 0,
+                'attempts': 0,
+            }
+            self.pending.append(job_id)
+        return job_id
+
+    def lease(self, worker_id):
+        with self.lock:
+            failed = self.expire_leases()
+            self.touch_worker(worker_id)
+            job = None
+            if self.pending:
+                job_id = self.pending.popleft()
+                job = self.jobs[job_id]
+                job['state'] = 'leased'
+                job['attempts'] += 1
+                self.leases[job_id] = {'worker_id': worker_id, 'expires': time.monotonic() + self.lease_timeout}
+                job = {key: job[key] for key in ('job_id', 'url', 'output_filename')}
+            elif self.all_jobs_finished():
+                self.workers[worker_id]['released'] = True
+        self.notify_failed(failed)
+        return job
+
+    def heartbeat(self, worker_id, job_id, progress=None):
+        with self.lock:
+            failed = self.expire_leases()
+            self.touch_worker(worker_id)
+            lease = self.leases.get(job_id)
+            ok = lease is not None and lease['worker_id'] == worker_id
+            if ok:
+                lease['expires'] = time.monotonic() + self.lease_timeout
+                if progress is not None:
+                    self.jobs[job_id]['progress'] = progress
+        self.notify_failed(failed)
+        if ok and progress is not None and self.progress_callback:
+            self.progress_callback(job_id, progress)
+        return ok
+
+    def complete(self, worker_id, job_id, success):
+        with self.lock:
+            failed = self.expire_leases()
+            self.touch_worker(worker_id)
+            lease = self.leases.get(job_id)
+            ok = lease is not None and lease['worker_id'] == worker_id
+            if ok:
+                del self.leases[job_id]
+                job = self.jobs[job_id]
+                job['state'] = 'done' if success else 'failed'
+                if success:
+                    job['progress'] = 100
+        self.notify_failed(failed)
+        if ok and self.completion_callback:
+            self.completion_callback(job_id, success)
+        return ok
+
+    def expire_leases(self):
+        # Callers must hold self.lock and pass the returned job ids to notify_failed()
+        # once it is released.
+        now = time.monotonic()
+        failed = []
+        for job_id, lease in list(self.leases.items()):
+            if lease['expires'] <= now:
+                del self.leases[job_id]
+                job = self.jobs[job_id]
+                job['progress'] = 0
+                if job['attempts'] >= self.max_attempts:
+                    # Crashes or hangs every worker that leases it; stop handing it out.
+                    logging.error(f"Lease on job {job_id} held by worker {lease['worker_id']} expired after {job['attempts']} attempts, marking failed")
+                    job['state'] = 'failed'
+                    failed.append(job_id)
+                else:
+                    logging.error(f"Lease on job {job_id} held by worker {lease['worker_id']} expired, re-queueing")
+                    job['state'] = 'pending'
+                    self.pending.appendleft(job_id)
+        return failed
+
+    def notify_failed(self, job_ids):
+        if self.completion_callback:
+            for job_id in job_ids:
+                self.completion_callback(job_id, False)
+
+    def touch_worker(self, worker_id):
+        # Callers must hold self.lock.
+        worker = self.workers.setdefault(worker_id, {'last_seen': 0, 'released': False})
+        worker['last_seen'] = time.monotonic()
+
+    def all_jobs_finished(self):
+        # Callers must hold self.lock.
+        return all(job['state'] in ('done', 'failed') for job in self.jobs.values())
+
+    def is_finished(self):
+        with self.lock:
+            failed = self.expire_leases()
+            finished = self.all_jobs_finished()
+        self.notify_failed(failed)
+        return finished
+
+    def workers_released(self):
+        # True once every worker heard from within worker_timeout has been told the
+        # queue is finished; workers that went silent are assumed dead.
+        with self.lock:
+            now = time.monotonic()
+            return all(worker['released'] or now - worker['last_seen'] > self.worker_timeout for worker in self.workers.values())
+
+    def status(self):
+        with self.lock:
+            failed = self.expire_leases()
+            status = {
+                'finished': self.all_jobs_finished(),
+                'jobs': [dict(job) for job in self.jobs.values()],
+            }
+        self.notify_failed(failed)
+        return status
+
+
+class CoordinatorRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/status':
+            self.send_json(200, self.server.job_queue.status())
+        else:
+            self.send_json(404, {'error': 'not found'})
+
+    required_fields = {
+        '/lease': ('worker_id',),
+        '/heartbeat': ('worker_id', 'job_id'),
+        '/complete': ('worker_id', 'job_id', 'success'),
+    }
+
+    def do_POST(self):
+        if self.path not in self.required_fields:
+            self.send_json(404, {'error': 'not found'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self.send_json(400, {'error': 'invalid JSON'})
+            return
+        if not isinstance(payload, dict):
+            self.send_json(400, {'error': 'request body must be a JSON object'})
+            return
+        missing = [field for field in self.required_fields[self.path] if field not in payload]
+        if missing:
+            self.send_json(400, {'error': f"missing fields: {', '.join(missing)}"})
+            return
+        progress = payload.get('progress')
+        if progress is not None and (isinstance(progress, bool) or not isinstance(progress, (int, float))):
+            self.send_json(400, {'error': 'progress must be a number'})
+            return
+        job_queue = self.server.job_queue
+        try:
+            if self.path == '/lease':
+                job = job_queue.lease(payload['worker_id'])
+                self.send_json(200, {'job': job, 'finished': job is None and job_queue.is_finished()})
+            elif self.path == '/heartbeat':
+                ok = job_queue.heartbeat(payload['worker_id'], payload['job_id'], progress)
+                self.send_json(200 if ok else 409, {'ok': ok})
+            else:
+                ok = job_queue.complete(payload['worker_id'], payload['job_id'], bool(payload['success']))
+                self.send_json(200 if ok else 409, {'ok': ok})
+        except (KeyError, TypeError) as e:
+            # e.g. an unhashable job_id
+            self.send_json(400, {'error': f"invalid request: {e}"})
+
+    def send_json(self, code, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Coordinator:
+    def __init__(self, host='127.0.0.1', port=0, lease_timeout=LEASE_TIMEOUT, progress_callback=None, completion_callback=None, max_attempts=MAX_ATTEMPTS):
+        self.job_queue = JobQueue(lease_timeout, progress_callback, completion_callback, max_attempts)
+        self.server = ThreadingHTTPServer((host, port), CoordinatorRequestHandler)
+        self.server.daemon_threads = True
+        self.server.job_queue = self.job_queue
+        self.thread = None
+
+    @property
+    def address(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def add_job(self, url, output_filename):
+        return self.job_queue.add_job(url, output_filename)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def wait(self, poll_interval=0.5):
+        while not self.job_queue.is_finished():
+            time.sleep(poll_interval)
+
+    def wait_for_workers(self, poll_interval=0.5):
+        # Keep serving until live workers have polled and been told the queue is
+        # finished, so they exit cleanly instead of finding the coordinator gone.
+        while not self.job_queue.workers_released():
+            time.sleep(poll_interval)
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class ConversionWorker:
+    def __init__(self, coordinator_url, worker_id=None, output_dir=None, heartbeat_interval=HEARTBEAT_INTERVAL, poll_interval=POLL_INTERVAL, retry_timeout=RETRY_TIMEOUT):
+        self.coordinator_url = coordinator_url.rstrip('/')
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.output_dir = output_dir
+        self.heartbeat_interval = heartbeat_interval
+        self.poll_interval = poll_interval
+        self.retry_timeout = retry_timeout
+        self.shutdown_event = threading.Event()
+
+    def run(self):
+        unreachable_since = None
+        while not self.shutdown_event.is_set():
+            try:
+                response = self.post('/lease', {'worker_id': self.worker_id})
+            except (urllib.error.URLError, OSError, ValueError) as e:
+                # Ride out coordinator restarts and network blips, but not forever.
+                now = time.monotonic()
+                if unreachable_since is None:
+                    unreachable_since = now
+                if now - unreachable_since >= self.retry_timeout:
+                    logging.error(f"Worker {self.worker_id} could not reach coordinator for {self.retry_timeout}s, giving up: {e}")
+                    return
+                self.shutdown_event.wait(self.poll_interval)
+                continue
+            unreachable_since = None
+            job = response.get('job')
+            if job:
+                self.run_job(job)
+            elif response.get('finished'):
+                return
+            else:
+                self.shutdown_event.wait(self.poll_interval)
+
+    def run_job(self, job):
+        output_filename = job['output_filename']
+        if self.output_dir:
+            output_filename = os.path.join(self.output_dir, os.path.basename(output_filename))
+        stop_event = threading.Event()
+        done_event = threading.Event()
+        state = {'progress': None, 'success': False}
+
+        def on_progress(progress):
+            state['progress'] = progress
+
+        def on_complete(success):
+            state['success'] = success
+            done_event.set()
+
+        task = ConversionTask(
+            url=job['url'],
+            output_filename=output_filename,
+            progress_callback=on_progress,
+            completion_callback=on_complete,
+            stop_event=stop_event
+        )
+        thread = threading.Thread(target=task.run, daemon=True)
+        thread.start()
+        while not done_event.wait(self.heartbeat_interval):
+            if self.shutdown_event.is_set() or not self.send_heartbeat(job['job_id'], state['progress']):
+                # Lease lost or worker shutting down; another worker will pick the job up.
+                stop_event.set()
+                thread.join()
+                return
+        thread.join()
+        try:
+            self.post('/complete', {'worker_id': self.worker_id, 'job_id': job['job_id'], 'success': state['success']})
+        except (urllib.error.URLError, OSError) as e:
+            logging.error(f"Worker {self.worker_id} failed to report job {job['job_id']}: {e}")
+
+    def send_heartbeat(self, job_id, progress):
+        try:
+            self.post('/heartbeat', {'worker_id': self.worker_id, 'job_id': job_id, 'progress': progress})
+            return True
+        except urllib.error.HTTPError:
+            return False
+        except (urllib.error.URLError, OSError) as e:
+            # Keep converting through transient outages; the coordinator decides when the lease is gone.
+            logging.error(f"Worker {self.worker_id} heartbeat failed: {e}")
+            return True
+
+    def post(self, path, payload):
+        request = urllib.request.Request(
+            self.coordinator_url + path,
+            data=json.dumps(payload).encode('utf-8'),
+            headers={'Content-Type': 'application/json'}
+        )
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return json.loads(response.read())
+
+
+def read_urls(file_path):
+    urls = []
+    with open(file_path, newline='') as f:
+        for row in csv.reader(f):
+            # Skip blank rows and header rows such as the one written by the "Convert to CSV" tab.
+            if row and '://' in row[0]:
+                urls.append(row[0].strip())
+    return urls
+
+
+def run_coordinator(args):
+    urls = read_urls(args.urls_file)
+    if not urls:
+        print(f"No URLs found in {args.urls_file}")
+        return
+    os.makedirs(args.save_directory, exist_ok=True)
+
+    def on_progress(job_id, progress):
+        print(f"{job_id}: {int(progress)}%")
+
+    def on_complete(job_id, success):
+        print(f"{job_id}: {'done' if success else 'failed'}")
+
+    coordinator = Coordinator(args.host, args.port, args.lease_timeout, on_progress, on_complete, args.max_attempts)
+    for file_counter, url in enumerate(urls, start=1):
+        output_filename = os.path.join(args.save_directory, f"{args.base_name}_{file_counter}.mp4")
+        coordinator.add_job(url, output_filename)
+    coordinator.start()
+    print(f"Coordinator listening on {coordinator.address} with {len(urls)} jobs")
+    try:
+        coordinator.wait()
+        coordinator.wait_for_workers()
+    finally:
+        coordinator.stop()
+    failed = [job for job in coordinator.job_queue.status()['jobs'] if job['state'] == 'failed']
+    print(f"Bulk conversion finished: {len(urls) - len(failed)} succeeded, {len(failed)} failed.")
+
+
+def run_worker(args):
+    worker = ConversionWorker(args.coordinator, args.worker_id, args.output_dir, args.heartbeat_interval, retry_timeout=args.retry_timeout)
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        worker.shutdown_event.set()
+
+
+def main():
+    logging.basicConfig(filename='conversion_errors.log', level=logging.ERROR, format='%(asctime)s:%(levelname)s:%(message)s')
+    parser = argparse.ArgumentParser(description="Distributed bulk M3U8 conversion")
+    subparsers = parser.add_subparsers(dest='mode', required=True)
+
+    coordinator_parser = subparsers.add_parser('coordinator', help="Serve a bulk job queue to workers")
+    coordinator_parser.add_argument('urls_file', help="CSV or text file with one URL per line")
+    coordinator_parser.add_argument('base_name', help="Base name for saved files")
+    coordinator_parser.add_argument('--save-directory', default=None)
+    coordinator_parser.add_argument('--host', default='127.0.0.1')
+    coordinator_parser.add_argument('--port', type=int, default=8765)
+    coordinator_parser.add_argument('--lease-timeout', type=float, default=LEASE_TIMEOUT)
+    coordinator_parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS, help="Leases a job may expire before it is marked failed")
+
+    worker_parser = subparsers.add_parser('worker', help="Lease and run jobs from a coordinator")
+    worker_parser.add_argument('coordinator', help="Coordinator URL, e.g. http://127.0.0.1:8765")
+    worker_parser.add_argument('--worker-id', default=None)
+    worker_parser.add_argument('--output-dir', default=None, help="Write files here instead of the coordinator's path")
+    worker_parser.add_argument('--heartbeat-interval', type=float, default=HEARTBEAT_INTERVAL)
+    worker_parser.add_argument('--retry-timeout', type=float, default=RETRY_TIMEOUT, help="Seconds to keep retrying an unreachable coordinator")
+
+    args = parser.parse_args()
+    if args.mode == 'coordinator':
+        if args.save_directory is None:
+            args.save_directory = os.path.join(os.path.expanduser("~"), "Downloads", args.base_name)
+        run_coordinator(args)
+    else:
+        run_worker(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# engine_benchmark.py
+#
+# Compares the thread-pool and asyncio conversion engines running many concurrent
+# lightweight streams. A small shell script stands in for ffmpeg so the numbers
+# reflect engine overhead rather than network or codec cost. Each engine is
+# measured in a fresh interpreter so peak RSS is not shared between runs.
+# POSIX only (uses the resource module and /bin/sh).
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+
+from conversion_engine import ThreadPoolEngine, AsyncioEngine
+from conversion_task import ConversionTask, AsyncConversionTask
+
+FAKE_FFMPEG = (
+    'echo "  Duration: 00:00:{duration:02d}.00, start: 0.000000"; '
+    'i=1; while [ $i -le {duration} ]; do sleep 1; echo "time=00:00:$(printf %02d $i).00"; i=$((i+1)); done'
+)
+
+def fake_command(task):
+    return ['/bin/sh', '-c', FAKE_FFMPEG.format(duration=task.duration_seconds)]
+
+class FakeConversionTask(ConversionTask):
+    duration_seconds = 2
+    build_command = fake_command
+
+class FakeAsyncConversionTask(AsyncConversionTask):
+    duration_seconds = 2
+    build_command = fake_command
+
+class FakeThreadPoolEngine(ThreadPoolEngine):
+    def create_task(self, **kwargs):
+        return FakeConversionTask(**kwargs)
+
+class FakeAsyncioEngine(AsyncioEngine):
+    def create_task(self, **kwargs):
+        return FakeAsyncConversionTask(**kwargs)
+
+FAKE_ENGINES = {
+    'thread': FakeThreadPoolEngine,
+    'asyncio': FakeAsyncioEngine,
+}
+
+def measure(engine_name, tasks, concurrency, duration):
+    FakeConversionTask.duration_seconds = duration
+    FakeAsyncConversionTask.duration_seconds = duration
+    stop_event = threading.Event()
+    done = threading.Semaphore(0)
+    results = []
+
+    def on_complete(success):
+        results.append(success)
+        done.release()
+
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    start = time.perf_counter()
+    engine = FAKE_ENGINES[engine_name](max_workers=concurrency)
+    peak_threads = threading.active_count()
+    for i in range(tasks):
+        task = engine.create_task(
+            url=f"bench://{i}",
+            output_filename=os.devnull,
+            progress_callback=lambda progress: None,
+            completion_callback=on_complete,
+            stop_event=stop_event
+        )
+        engine.submit(task)
+        peak_threads = max(peak_threads, threading.active_count())
+    for _ in range(tasks):
+        done.acquire()
+        peak_threads = max(peak_threads, threading.active_count())
+    elapsed = time.perf_counter() - start
+    engine.shutdown(wait=True)
+    usage_after = resource.getrusage(resource.RUSAGE_SELF)
+
+    # ru_maxrss is KiB on Linux and bytes on macOS.
+    max_rss_kib = usage_after.ru_maxrss if sys.platform != 'darwin' else usage_after.ru_maxrss // 1024
+    return {
+        'engine': engine_name,
+        'tasks': tasks,
+        'concurrency': concurrency,
+        'succeeded': sum(results),
+        'elapsed_seconds': round(elapsed, 2),
+        'peak_threads': peak_threads,
+        'max_rss_kib': max_rss_kib,
+        'voluntary_context_switches': usage_after.ru_nvcsw - usage_before.ru_nvcsw,
+        'involuntary_context_switches': usage_after.ru_nivcsw - usage_before.ru_nivcsw,
+        'cpu_seconds': round((usage_after.ru_utime - usage_before.ru_utime) + (usage_after.ru_stime - usage_before.ru_stime), 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark conversion engines")
+    parser.add_argument('--engine', choices=list(FAKE_ENGINES), help="Measure a single engine in this process")
+    parser.add_argument('--tasks', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=None, help="Defaults to --tasks, i.e. all streams at once")
+    parser.add_argument('--duration', type=int, default=2, help="Seconds of fake progress output per stream")
+    args = parser.parse_args()
+    concurrency = args.concurrency or args.tasks
+
+    if args.engine:
+        print(json.dumps(measure(args.engine, args.tasks, concurrency, args.duration)))
+        return
+
+    rows = []
+    for engine_name in FAKE_ENGINES:
+        output = subprocess.run(
+            [sys.executable, __file__, '--engine', engine_name, '--tasks', str(args.tasks), '--concurrency', str(concurrency), '--duration', str(args.duration)],
+            check=True, capture_output=True, text=True
+        ).stdout
+        rows.append(json.loads(output))
+
+    columns = ['engine', 'succeeded', 'elapsed_seconds', 'peak_threads', 'max_rss_kib', 'voluntary_context_switches', 'involuntary_context_switches', 'cpu_seconds']
+    print(" | ".join(columns))
+    for row in rows:
+        print(" | ".join(str(row[column]) for column in columns))
+
+if __name__ == "__main__":
+    main()
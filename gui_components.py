@@ -13,13 +13,17 @@ import subprocess
 import csv
 
 from url_manager import URLManager
-from conversion_task import ConversionTask
+from conversion_engine import create_engine
+from bulk_pipeline import ProfilePipeline
+from output_profiles import PROFILES, COPY_PROFILE, transcode_slots
 from ytDlp import YoutubeDLTask
 from audio_transcription import AudioTranscriptionTask
 from transcription_tab import TranscriptionTab
 
 logging.basicConfig(filename='conversion_errors.log', level=logging.ERROR, format='%(asctime)s:%(levelname)s:%(message)s')
 SESSION_FILE = 'session.json'
+CONVERSION_ENGINE = os.environ.get('M3U8_CONVERSION_ENGINE', 'thread')
+TRANSCODE_WORKERS, TRANSCODE_THREADS = transcode_slots()
 
 class M3U8ConverterApp:
     def __init__(self, master):
@@ -28,8 +32,11 @@ class M3U8ConverterApp:
         self.url_manager = URLManager()
         self.bulk_conversion_active = threading.Event()
         self.stop_event = threading.Event()
+        self.closing = False
         self.setup_ui()
         self.executor = ThreadPoolExecutor(max_workers=4)
+        self.engine = create_engine(CONVERSION_ENGINE, max_workers=4)
+        self.transcode_engine = self.engine.sibling(TRANSCODE_WORKERS)
         self.task_queue = queue.Queue()
         self.completed_tasks = 0
         self.total_tasks = 0
@@ -94,6 +101,14 @@ class M3U8ConverterApp:
         self.folder_name_entry = ttk.Entry(bulk_frame, width=50)
         self.folder_name_entry.grid(row=2, column=1, columnspan=2, padx=5, pady=5, sticky="ew")
 
+        ttk.Label(bulk_frame, text="Output Profiles:").grid(row=3, column=0, padx=5, pady=5, sticky="w")
+        profiles_frame = ttk.Frame(bulk_frame)
+        profiles_frame.grid(row=4, column=0, columnspan=3, padx=5, pady=5, sticky="w")
+        self.profile_vars = {}
+        for name, profile in PROFILES.items():
+            self.profile_vars[name] = tk.BooleanVar(value=name == COPY_PROFILE)
+            ttk.Checkbutton(profiles_frame, text=profile.label, variable=self.profile_vars[name]).pack(side=tk.LEFT, padx=5)
+
         ttk.Button(bulk_frame, text="Convert All", command=self.convert_all_bulk).grid(row=5, column=0, padx=5, pady=5, sticky="w")
         self.bulk_status_label = ttk.Label(bulk_frame, text="Files remaining: 0")
         self.bulk_status_label.grid(row=6, column=0, columnspan=3, padx=5, pady=5, sticky="ew")
@@ -185,22 +200,26 @@ class M3U8ConverterApp:
         self.update_status("Starting conversion...")
         output_filename = filedialog.asksaveasfilename(defaultextension=".mp4", filetypes=[("MP4 files", "*.mp4")])
         if output_filename:
-            task = ConversionTask(
+            task = self.engine.create_task(
                 url=self.url_entry.get(),
                 output_filename=output_filename,
                 progress_callback=self.update_progress,
                 completion_callback=self.conversion_complete,
                 stop_event=self.stop_event
             )
-            self.executor.submit(task.run)
+            self.engine.submit(task)
             self.delete_folder_button.config(state=tk.DISABLED)  # Disable the delete button during conversion
 
     def update_progress(self, progress):
+        if self.closing:
+            return
         self.progress['value'] = progress
         int_progress = int(progress)
         self.update_status(f"Converting... {int_progress}% completed.")
 
     def conversion_complete(self, success):
+        if self.closing:
+            return
         if success:
             self.save_path_label.config(text="File saved successfully.", foreground='green')
             self.url_manager.save_url(self.url_entry.get())
@@ -323,6 +342,11 @@ class M3U8ConverterApp:
             messagebox.showerror("Error", "No URLs available for conversion.")
             return
 
+        profiles = [PROFILES[name] for name, var in self.profile_vars.items() if var.get()]
+        if not profiles:
+            messagebox.showerror("Error", "Please select at least one output profile.")
+            return
+
         downloads_directory = os.path.join(os.path.expanduser("~"), "Downloads")
         self.save_directory = os.path.join(downloads_directory, base_name)
         if not os.path.exists(self.save_directory):
@@ -332,32 +356,38 @@ class M3U8ConverterApp:
         self.bulk_conversion_active.set()
         self.stop_event.clear()
         self.delete_folder_button.config(state=tk.DISABLED)
-        self.total_tasks = len(urls)
+        self.total_tasks = len(urls) * len(profiles)
         self.completed_tasks = 0
         self.bulk_status_label.config(text=f"Files remaining: {self.total_tasks}")
 
         for url in urls:
             self.task_queue.put(url)
 
-        thread = threading.Thread(target=self.bulk_convert, args=(base_name,))
-        thread.start()
+        # Submitting to the engine does not block, so no dedicated thread is needed here.
+        self.bulk_convert(base_name, profiles)
 
-    def bulk_convert(self, base_name):
+    def bulk_convert(self, base_name, profiles):
+        pipeline = ProfilePipeline(self.engine, self.transcode_engine, profiles, self.stop_event, transcode_threads=TRANSCODE_THREADS)
         file_counter = 1
         while not self.task_queue.empty() and self.bulk_conversion_active.is_set():
             url = self.task_queue.get()
-            output_filename = os.path.join(self.save_directory, f"{base_name}_{file_counter}.mp4")
-            task = ConversionTask(
-                url=url,
-                output_filename=output_filename,
-                progress_callback=lambda p: self.bulk_status_label.config(text=f"Files remaining: {self.total_tasks - self.completed_tasks - 1}"),
-                completion_callback=self.bulk_task_complete,
-                stop_event=self.stop_event
+            base_path = os.path.join(self.save_directory, f"{base_name}_{file_counter}")
+            pipeline.submit(
+                url,
+                base_path,
+                completion_callback=lambda profile, success: self.bulk_task_complete(success),
+                progress_callback=self.bulk_task_progress
             )
-            self.executor.submit(task.run)
             file_counter += 1
 
+    def bulk_task_progress(self, progress):
+        if self.closing:
+            return
+        self.bulk_status_label.config(text=f"Files remaining: {self.total_tasks - self.completed_tasks - 1}")
+
     def bulk_task_complete(self, success):
+        if self.closing:
+            return
         self.completed_tasks += 1
         if self.completed_tasks == self.total_tasks:
             self.update_status("Bulk conversion completed successfully.")
@@ -390,5 +420,15 @@ class M3U8ConverterApp:
         self.update_status(f"Switched to {selected_tab} tab")
 
     def on_close(self):
+        # Engine callbacks stop touching widgets from here on; shutdown() runs after
+        # mainloop returns so waiting on the engines cannot block Tk event handling.
+        self.closing = True
+        # Both engines terminate their ffmpeg children instead of finishing the queue.
+        self.bulk_conversion_active.clear()
+        self.stop_event.set()
         self.save_session()
         self.master.destroy()
+
+    def shutdown(self):
+        self.transcode_engine.shutdown(wait=True)
+        self.engine.shutdown(wait=True)
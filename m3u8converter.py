@@ -7,6 +7,7 @@ def main():
     root = tk.Tk()
     app = M3U8ConverterApp(root)
     root.mainloop()
+    app.shutdown()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,37 @@
+# output_profiles.py
+
+import os
+
+class OutputProfile:
+    def __init__(self, name, label, extension, ffmpeg_args, cpu_bound=False, suffix='', max_threads=None):
+        self.name = name
+        self.label = label
+        self.extension = extension
+        self.ffmpeg_args = ffmpeg_args
+        # Stream copies and remuxes are limited by network/disk; re-encodes by CPU.
+        self.cpu_bound = cpu_bound
+        self.suffix = suffix
+        # Encoders that cannot use more threads (e.g. libmp3lame) should not claim them.
+        self.max_threads = max_threads
+
+    def output_filename(self, base_path):
+        return f"{base_path}{self.suffix}.{self.extension}"
+
+COPY_PROFILE = 'copy'
+
+PROFILES = {
+    'copy': OutputProfile('copy', "MP4 (stream copy)", 'mp4', ['-vcodec', 'copy', '-acodec', 'copy']),
+    'm4a': OutputProfile('m4a', "M4A audio", 'm4a', ['-vn', '-acodec', 'copy']),
+    'mp3': OutputProfile('mp3', "MP3 audio", 'mp3', ['-vn', '-acodec', 'libmp3lame', '-b:a', '192k'], cpu_bound=True, max_threads=1),
+    'h264_720p': OutputProfile('h264_720p', "H.264 720p", 'mp4', ['-vf', 'scale=-2:720', '-vcodec', 'libx264', '-preset', 'veryfast', '-crf', '23', '-acodec', 'aac', '-b:a', '128k'], cpu_bound=True, suffix='_720p'),
+    'h264_480p': OutputProfile('h264_480p', "H.264 480p", 'mp4', ['-vf', 'scale=-2:480', '-vcodec', 'libx264', '-preset', 'veryfast', '-crf', '23', '-acodec', 'aac', '-b:a', '96k'], cpu_bound=True, suffix='_480p'),
+}
+
+def transcode_slots(max_jobs=None):
+    # Returns (concurrent transcodes, ffmpeg threads per transcode) such that
+    # their product never exceeds the core count.
+    cores = os.cpu_count() or 1
+    if max_jobs is None:
+        max_jobs = max(1, cores // 2)
+    jobs = max(1, min(max_jobs, cores))
+    return jobs, max(1, cores // jobs)
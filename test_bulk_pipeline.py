@@ -0,0 +1,151 @@
+# test_bulk_pipeline.py
+
+import os
+import sys
+import threading
+
+import pytest
+
+import output_profiles
+from bulk_pipeline import ProfilePipeline
+from conversion_engine import create_engine
+from conversion_task import ConversionTask
+from output_profiles import PROFILES, transcode_slots
+
+# Writes its output file and exits 0, or exits 1 without output when the input
+# URL contains "fail".
+STUB_FFMPEG = f"""#!{sys.executable}
+import sys
+source = sys.argv[sys.argv.index('-i') + 1]
+print("  Duration: 00:00:01.00, start: 0.000000", flush=True)
+if 'fail' in source:
+    sys.exit(1)
+print("time=00:00:01.00", flush=True)
+open(sys.argv[-1], "w").write("converted from " + source)
+"""
+
+
+@pytest.fixture
+def stub_ffmpeg(tmp_path, monkeypatch):
+    bin_dir = tmp_path / 'bin'
+    bin_dir.mkdir()
+    stub = bin_dir / 'ffmpeg'
+    stub.write_text(STUB_FFMPEG)
+    stub.chmod(0o755)
+    monkeypatch.setenv('PATH', f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+
+@pytest.fixture(params=['thread', 'asyncio'])
+def engines(request, stub_ffmpeg):
+    io_engine = create_engine(request.param, max_workers=2)
+    transcode_engine = io_engine.sibling(2)
+    submitted = []
+
+    def recording(engine, label):
+        submit = engine.submit
+
+        def record(task):
+            submitted.append((label, task.profile.name, task.threads))
+            return submit(task)
+
+        engine.submit = record
+
+    recording(io_engine, 'io')
+    recording(transcode_engine, 'transcode')
+    yield io_engine, transcode_engine, submitted
+    transcode_engine.shutdown(wait=True)
+    io_engine.shutdown(wait=True)
+
+
+class Completions:
+    def __init__(self, base_path):
+        self.source_filename = f"{base_path}.source.mp4"
+        self.results = []
+        self.source_present = []
+        self.lock = threading.Lock()
+        self.done = threading.Semaphore(0)
+
+    def __call__(self, profile, success):
+        with self.lock:
+            self.results.append((profile.name, success))
+            self.source_present.append(os.path.exists(self.source_filename))
+        self.done.release()
+
+    def wait(self, count):
+        for _ in range(count):
+            assert self.done.acquire(timeout=10), f"only got {self.results}"
+        # No callback beyond one per profile.
+        assert not self.done.acquire(timeout=0.3)
+
+
+def run_pipeline(engines, tmp_path, profile_names, url='http://example/a.m3u8', transcode_threads=4):
+    io_engine, transcode_engine, _ = engines
+    base_path = str(tmp_path / 'clip_1')
+    completions = Completions(base_path)
+    pipeline = ProfilePipeline(io_engine, transcode_engine, [PROFILES[name] for name in profile_names], threading.Event(), transcode_threads=transcode_threads)
+    pipeline.submit(url, base_path, completion_callback=completions)
+    completions.wait(len(profile_names))
+    return base_path, completions
+
+
+@pytest.mark.parametrize('cores', [None, 1, 2, 3, 4, 6, 8, 16, 64])
+@pytest.mark.parametrize('max_jobs', [None, 1, 3, 100])
+def test_transcode_slots_never_oversubscribe(monkeypatch, cores, max_jobs):
+    monkeypatch.setattr(output_profiles.os, 'cpu_count', lambda: cores)
+    jobs, threads = transcode_slots(max_jobs)
+    assert jobs >= 1 and threads >= 1
+    assert jobs * threads <= (cores or 1)
+
+
+def test_threads_cap_decoder_filters_and_encoder():
+    task = ConversionTask('in.mp4', 'out.mp4', None, None, None, profile=PROFILES['h264_720p'], threads=3)
+    command = task.build_command()
+    input_index = command.index('-i')
+    assert command[1:input_index] == ['-filter_threads', '3', '-threads', '3']
+    assert command[-3:] == ['-threads', '3', 'out.mp4']
+
+    command = ConversionTask('in.m3u8', 'out.mp4', None, None, None).build_command()
+    assert '-threads' not in command and '-filter_threads' not in command
+
+
+def test_all_profiles_succeed_and_keep_copy(engines, tmp_path):
+    names = ['copy', 'm4a', 'mp3', 'h264_720p']
+    base_path, completions = run_pipeline(engines, tmp_path, names)
+    assert sorted(completions.results) == sorted((name, True) for name in names)
+    for name in names:
+        assert os.path.exists(PROFILES[name].output_filename(base_path))
+    assert not os.path.exists(completions.source_filename)
+
+
+def test_profiles_are_routed_by_cpu_cost(engines, tmp_path):
+    run_pipeline(engines, tmp_path, ['m4a', 'mp3', 'h264_720p'], transcode_threads=4)
+    _, _, submitted = engines
+    assert sorted(submitted) == sorted([
+        ('io', 'copy', None),
+        ('io', 'm4a', None),
+        ('transcode', 'mp3', 1),
+        ('transcode', 'h264_720p', 4),
+    ])
+
+
+def test_intermediate_source_removed_after_last_derived_job(engines, tmp_path):
+    base_path, completions = run_pipeline(engines, tmp_path, ['m4a', 'h264_480p'])
+    assert sorted(completions.results) == [('h264_480p', True), ('m4a', True)]
+    # Every derived job still had the source when it reported back.
+    assert completions.source_present == [True, True]
+    assert not os.path.exists(completions.source_filename)
+    assert not os.path.exists(PROFILES['copy'].output_filename(base_path))
+
+
+def test_source_failure_fails_every_profile(engines, tmp_path):
+    names = ['copy', 'm4a', 'mp3']
+    _, completions = run_pipeline(engines, tmp_path, names, url='http://example/fail.m3u8')
+    assert sorted(completions.results) == sorted((name, False) for name in names)
+    _, _, submitted = engines
+    assert submitted == [('io', 'copy', None)]
+
+
+def test_source_failure_without_copy_removes_intermediate(engines, tmp_path):
+    _, completions = run_pipeline(engines, tmp_path, ['m4a', 'mp3'], url='http://example/fail.m3u8')
+    assert sorted(completions.results) == [('m4a', False), ('mp3', False)]
+    assert not os.path.exists(completions.source_filename)
@@ -0,0 +1,196 @@
+# test_conversion_engine.py
+
+import os
+import threading
+import time
+
+import pytest
+
+from engine_benchmark import FakeConversionTask, FakeAsyncConversionTask, FAKE_ENGINES
+
+FAILING_FFMPEG = ['/bin/sh', '-c', 'echo "  Duration: 00:00:01.00, start: 0.000000"; echo "broken stream"; exit 3']
+
+
+class Recorder:
+    def __init__(self):
+        self.progress = []
+        self.results = []
+        self.first_progress = threading.Event()
+        self.done = threading.Semaphore(0)
+
+    def on_progress(self, progress):
+        self.progress.append(progress)
+        self.first_progress.set()
+
+    def on_complete(self, success):
+        self.results.append(success)
+        self.done.release()
+
+    def wait(self, count=1, timeout=10):
+        for _ in range(count):
+            assert self.done.acquire(timeout=timeout), "conversion did not complete"
+
+
+def make_engine(engine_name, max_workers=4, duration=1, command=None):
+    # Subclass the benchmark stubs so tests do not touch their shared class attributes.
+    task_class = FakeConversionTask if engine_name == 'thread' else FakeAsyncConversionTask
+    attributes = {'duration_seconds': duration}
+    if command is not None:
+        attributes['build_command'] = lambda task: command
+    task_class = type(f"Test{task_class.__name__}", (task_class,), attributes)
+    engine = FAKE_ENGINES[engine_name](max_workers=max_workers)
+    engine.create_task = lambda **kwargs: task_class(**kwargs)
+    return engine
+
+
+def submit(engine, recorder, stop_event, index=0):
+    task = engine.create_task(
+        url=f"test://{index}",
+        output_filename=os.devnull,
+        progress_callback=recorder.on_progress,
+        completion_callback=recorder.on_complete,
+        stop_event=stop_event
+    )
+    engine.submit(task)
+    return task
+
+
+def returncode(task, timeout=5):
+    # Popen and asyncio.subprocess.Process expose the exit status differently.
+    if hasattr(task.process, 'poll'):
+        return task.process.wait(timeout=timeout)
+    return task.process.returncode
+
+
+@pytest.fixture(params=list(FAKE_ENGINES))
+def engine_name(request):
+    return request.param
+
+
+def test_progress_and_completion_callbacks(engine_name):
+    engine = make_engine(engine_name, duration=2)
+    recorder = Recorder()
+    try:
+        submit(engine, recorder, threading.Event())
+        recorder.wait()
+    finally:
+        engine.shutdown(wait=True)
+    assert recorder.progress == [50.0, 100.0]
+    assert recorder.results == [True]
+
+
+def test_stop_event_terminates_running_child(engine_name):
+    engine = make_engine(engine_name, duration=30)
+    recorder = Recorder()
+    stop_event = threading.Event()
+    try:
+        task = submit(engine, recorder, stop_event)
+        assert recorder.first_progress.wait(timeout=10)
+        stop_event.set()
+        recorder.wait(timeout=5)
+        assert recorder.results == [False]
+        assert returncode(task) not in (None, 0)
+    finally:
+        engine.shutdown(wait=True)
+
+
+def test_nonzero_exit_reports_failure(engine_name):
+    engine = make_engine(engine_name, command=FAILING_FFMPEG)
+    recorder = Recorder()
+    try:
+        submit(engine, recorder, threading.Event())
+        recorder.wait()
+    finally:
+        engine.shutdown(wait=True)
+    assert recorder.results == [False]
+
+
+def test_max_workers_limits_concurrency(engine_name):
+    active = {'now': 0, 'peak': 0}
+    lock = threading.Lock()
+    engine = make_engine(engine_name, max_workers=2, duration=1)
+    create_task = engine.create_task
+
+    def counting_task(**kwargs):
+        task = create_task(**kwargs)
+        build_command = task.build_command
+
+        def tracked_build_command():
+            with lock:
+                active['now'] += 1
+                active['peak'] = max(active['peak'], active['now'])
+            return build_command()
+
+        def tracked_complete(success, complete=task.completion_callback):
+            with lock:
+                active['now'] -= 1
+            complete(success)
+
+        task.build_command = tracked_build_command
+        task.completion_callback = tracked_complete
+        return task
+
+    engine.create_task = counting_task
+    recorder = Recorder()
+    try:
+        for index in range(5):
+            submit(engine, recorder, threading.Event(), index)
+        recorder.wait(count=5)
+    finally:
+        engine.shutdown(wait=True)
+    assert recorder.results == [True] * 5
+    assert active['peak'] == 2
+
+
+def test_asyncio_shutdown_cancels_running_and_queued_tasks():
+    engine = make_engine('asyncio', max_workers=1, duration=30)
+    transcode_engine = engine.sibling(1)
+    transcode_engine.create_task = engine.create_task
+    recorder = Recorder()
+    running = submit(engine, recorder, threading.Event(), 0)
+    submit(engine, recorder, threading.Event(), 1)
+    sibling_task = submit(transcode_engine, recorder, threading.Event(), 2)
+    assert recorder.first_progress.wait(timeout=10)
+
+    engine.shutdown(wait=True)
+    recorder.wait(count=3, timeout=1)
+    assert recorder.results == [False, False, False]
+    assert running.process.returncode not in (None, 0)
+    assert sibling_task.process.returncode not in (None, 0)
+    assert not engine.thread.is_alive()
+
+
+def test_async_task_run_works_alongside_engine():
+    engine = make_engine('asyncio', duration=30)
+    engine_recorder = Recorder()
+    recorder = Recorder()
+    try:
+        submit(engine, engine_recorder, threading.Event())
+        assert engine_recorder.first_progress.wait(timeout=10)
+        task_class = type('ShortTask', (FakeAsyncConversionTask,), {'duration_seconds': 1})
+        task = task_class(url='test://run', output_filename=os.devnull, progress_callback=recorder.on_progress, completion_callback=recorder.on_complete, stop_event=threading.Event())
+        thread = threading.Thread(target=task.run)
+        thread.start()
+        thread.join(timeout=10)
+        assert recorder.results == [True]
+    finally:
+        engine.shutdown(wait=True)
+
+
+@pytest.mark.skipif(not hasattr(os, 'pidfd_open'), reason="pidfd child watcher is Linux only")
+def test_asyncio_engine_does_not_spawn_a_thread_per_child():
+    baseline = threading.active_count()
+    engine = make_engine('asyncio', max_workers=20, duration=1)
+    recorder = Recorder()
+    peak = baseline
+    try:
+        for index in range(20):
+            submit(engine, recorder, threading.Event(), index)
+        deadline = time.monotonic() + 10
+        while len(recorder.results) < 20 and time.monotonic() < deadline:
+            peak = max(peak, threading.active_count())
+            time.sleep(0.05)
+        recorder.wait(count=20)
+    finally:
+        engine.shutdown(wait=True)
+    assert peak <= baseline + 1
@@ -0,0 +1,247 @@
+# test_distributed_conversion.py
+
+import json
+import os
+import signal
+import threading
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from distributed_conversion import Coordinator, ConversionWorker, JobQueue
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'distributed_conversion.py')
+
+STUB_FFMPEG = f"""#!{sys.executable}
+import sys, time
+print("  Duration: 00:00:03.00, start: 0.000000", flush=True)
+for i in range(1, 4):
+    time.sleep(0.3)
+    print(f"time=00:00:0{{i}}.00", flush=True)
+open(sys.argv[-1], "w").write("converted")
+"""
+
+
+def post(url, payload, raw=None):
+    data = raw if raw is not None else json.dumps(payload).encode('utf-8')
+    request = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def get_status(address):
+    with urllib.request.urlopen(address + '/status', timeout=5) as response:
+        return json.loads(response.read())
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def coordinator():
+    coordinator = Coordinator(lease_timeout=0.2)
+    coordinator.start()
+    yield coordinator
+    coordinator.stop()
+
+
+def test_expire_leases_requeues_job():
+    job_queue = JobQueue(lease_timeout=0.05)
+    job_id = job_queue.add_job('http://example/a.m3u8', 'a.mp4')
+    assert job_queue.lease('worker-a')['job_id'] == job_id
+    assert job_queue.lease('worker-b') is None
+
+    time.sleep(0.1)
+    with job_queue.lock:
+        job_queue.expire_leases()
+    assert job_queue.jobs[job_id]['state'] == 'pending'
+    assert job_queue.leases == {}
+
+    assert job_queue.lease('worker-b')['job_id'] == job_id
+    assert job_queue.jobs[job_id]['attempts'] == 2
+    assert not job_queue.heartbeat('worker-a', job_id)
+    assert job_queue.complete('worker-b', job_id, True)
+    assert job_queue.is_finished()
+
+
+def test_job_fails_after_max_attempts():
+    completed = []
+    job_queue = JobQueue(lease_timeout=0.05, completion_callback=lambda job_id, success: completed.append((job_id, success)), max_attempts=2)
+    job_id = job_queue.add_job('http://example/poison.m3u8', 'poison.mp4')
+    assert job_queue.lease('worker-a')['job_id'] == job_id
+    time.sleep(0.1)
+    assert job_queue.lease('worker-b')['job_id'] == job_id
+    time.sleep(0.1)
+
+    assert job_queue.is_finished()
+    assert job_queue.jobs[job_id]['state'] == 'failed'
+    assert job_queue.lease('worker-c') is None
+    assert completed == [(job_id, False)]
+
+
+def test_workers_released_once_told_queue_is_finished():
+    job_queue = JobQueue(lease_timeout=0.2, worker_timeout=0.2)
+    job_id = job_queue.add_job('http://example/a.m3u8', 'a.mp4')
+    job_queue.lease('worker-a')
+    job_queue.complete('worker-a', job_id, True)
+    assert job_queue.is_finished()
+    assert not job_queue.workers_released()
+
+    assert job_queue.lease('worker-a') is None
+    assert job_queue.workers_released()
+
+    # A worker that goes silent for longer than worker_timeout is not waited for.
+    job_queue.touch_worker('worker-b')
+    assert not job_queue.workers_released()
+    time.sleep(0.3)
+    assert job_queue.workers_released()
+
+
+def test_worker_retries_until_coordinator_comes_up():
+    port = free_port()
+    worker = ConversionWorker(f"http://127.0.0.1:{port}", poll_interval=0.1, retry_timeout=10)
+    thread = threading.Thread(target=worker.run, daemon=True)
+    thread.start()
+    time.sleep(0.5)
+    assert thread.is_alive()
+
+    coordinator = Coordinator(port=port)
+    coordinator.start()
+    try:
+        thread.join(timeout=5)
+        assert not thread.is_alive()
+        assert coordinator.job_queue.workers_released()
+    finally:
+        coordinator.stop()
+
+
+def test_worker_gives_up_after_retry_timeout():
+    worker = ConversionWorker(f"http://127.0.0.1:{free_port()}", poll_interval=0.1, retry_timeout=0.5)
+    start = time.monotonic()
+    worker.run()
+    assert 0.5 <= time.monotonic() - start < 5
+
+
+def test_late_complete_from_expired_lease_is_rejected(coordinator):
+    job_id = coordinator.add_job('http://example/a.m3u8', 'a.mp4')
+    status, response = post(coordinator.address + '/lease', {'worker_id': 'worker-a'})
+    assert status == 200 and response['job']['job_id'] == job_id
+
+    time.sleep(0.3)
+    status, response = post(coordinator.address + '/lease', {'worker_id': 'worker-b'})
+    assert status == 200 and response['job']['job_id'] == job_id
+
+    status, response = post(coordinator.address + '/complete', {'worker_id': 'worker-a', 'job_id': job_id, 'success': True})
+    assert status == 409 and response == {'ok': False}
+    status, _ = post(coordinator.address + '/heartbeat', {'worker_id': 'worker-a', 'job_id': job_id})
+    assert status == 409
+
+    status, response = post(coordinator.address + '/complete', {'worker_id': 'worker-b', 'job_id': job_id, 'success': True})
+    assert status == 200 and response == {'ok': True}
+    assert get_status(coordinator.address)['finished']
+
+
+@pytest.mark.parametrize('path, payload, raw', [
+    ('/lease', None, b'not json'),
+    ('/lease', None, b'[]'),
+    ('/lease', {}, None),
+    ('/heartbeat', {'worker_id': 'worker-a'}, None),
+    ('/complete', {'worker_id': 'worker-a', 'job_id': 'x'}, None),
+    ('/complete', {'worker_id': 'worker-a', 'job_id': ['x'], 'success': True}, None),
+    ('/heartbeat', {'worker_id': 'worker-a', 'job_id': 'x', 'progress': 'abc'}, None),
+    ('/heartbeat', {'worker_id': 'worker-a', 'job_id': 'x', 'progress': True}, None),
+])
+def test_malformed_requests_get_400(coordinator, path, payload, raw):
+    status, response = post(coordinator.address + path, payload, raw)
+    assert status == 400
+    assert 'error' in response
+    # The server is still answering afterwards.
+    assert get_status(coordinator.address)['finished']
+
+
+def test_workers_as_separate_processes_recover_killed_worker(tmp_path):
+    bin_dir = tmp_path / 'bin'
+    bin_dir.mkdir()
+    stub = bin_dir / 'ffmpeg'
+    stub.write_text(STUB_FFMPEG)
+    stub.chmod(0o755)
+    env = dict(os.environ, PATH=f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+    urls_file = tmp_path / 'urls.csv'
+    urls_file.write_text('M3U8 URLs\n' + ''.join(f"http://example/{i}.m3u8\n" for i in range(4)))
+    save_directory = tmp_path / 'out'
+    port = free_port()
+    address = f"http://127.0.0.1:{port}"
+
+    def spawn(*args, stdout=subprocess.DEVNULL):
+        return subprocess.Popen([sys.executable, SCRIPT, *args], cwd=tmp_path, env=env, stdout=stdout, stderr=subprocess.DEVNULL, text=True)
+
+    processes = []
+    try:
+        coordinator = spawn('coordinator', str(urls_file), 'base', '--save-directory', str(save_directory), '--port', str(port), '--lease-timeout', '1', stdout=subprocess.PIPE)
+        processes.append(coordinator)
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                get_status(address)
+                break
+            except OSError:
+                assert time.monotonic() < deadline, "coordinator did not start"
+                time.sleep(0.1)
+
+        doomed = spawn('worker', address, '--heartbeat-interval', '0.2')
+        processes.append(doomed)
+        while True:
+            leased = [job for job in get_status(address)['jobs'] if job['state'] == 'leased']
+            if leased:
+                break
+            assert time.monotonic() < deadline, "doomed worker never leased a job"
+            time.sleep(0.05)
+        os.kill(doomed.pid, signal.SIGKILL)
+        doomed.wait()
+        killed_job_id = leased[0]['job_id']
+
+        processes.append(spawn('worker', address, '--heartbeat-interval', '0.2'))
+        processes.append(spawn('worker', address, '--heartbeat-interval', '0.2'))
+
+        # The coordinator exits on its own once the surviving workers have been told
+        # the queue is finished, so keep the last /status snapshot seen before that.
+        snapshot = None
+        deadline = time.monotonic() + 30
+        while coordinator.poll() is None:
+            try:
+                snapshot = get_status(address)
+            except OSError:
+                pass
+            assert time.monotonic() < deadline, f"coordinator did not finish: {snapshot}"
+            time.sleep(0.05)
+        output = coordinator.stdout.read()
+        assert coordinator.returncode == 0
+
+        jobs = {job['job_id']: job for job in snapshot['jobs']}
+        assert jobs[killed_job_id]['attempts'] == 2
+        assert all(f"{job_id}: done" in output for job_id in jobs)
+        assert "4 succeeded, 0 failed" in output
+        assert sorted(os.listdir(save_directory)) == [f"base_{i}.mp4" for i in range(1, 5)]
+
+        for process in processes[2:]:
+            assert process.wait(timeout=10) == 0
+        # Surviving workers were told the queue was finished before the coordinator stopped.
+        with open(tmp_path / 'conversion_errors.log') as f:
+            assert 'could not reach coordinator' not in f.read()
+    finally:
+        for process in processes:
+            if process.poll() is None:
+                process.kill()
+                process.wait()